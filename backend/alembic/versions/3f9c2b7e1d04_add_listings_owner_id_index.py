@@ -0,0 +1,38 @@
+"""add_listings_owner_id_index
+
+Revision ID: 3f9c2b7e1d04
+Revises: ad633f9e3077
+Create Date: 2026-10-19 10:12:31.482913
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3f9c2b7e1d04"
+down_revision: str | Sequence[str] | None = "ad633f9e3077"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fresh databases get the index from create_all() after alembic runs
+    if not sa.inspect(op.get_bind()).has_table("listings"):
+        return
+    # CONCURRENTLY keeps listings writable while the index builds, but cannot
+    # run inside a transaction
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_listings_owner_id ON listings(owner_id)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_listings_owner_id")
@@ -0,0 +1,38 @@
+"""add_listings_updated_at_index
+
+Revision ID: 7c1e5a9b2f36
+Revises: 3f9c2b7e1d04
+Create Date: 2026-10-19 14:03:52.117604
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7c1e5a9b2f36"
+down_revision: str | Sequence[str] | None = "3f9c2b7e1d04"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fresh databases get the index from create_all() after alembic runs
+    if not sa.inspect(op.get_bind()).has_table("listings"):
+        return
+    # CONCURRENTLY keeps listings writable while the index builds, but cannot
+    # run inside a transaction
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_listings_updated_at ON listings(updated_at)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_listings_updated_at")
@@ -0,0 +1,214 @@
+"""Garbage collect uploaded images that no listing references.
+
+Listings that are deleted or get a new image leave their old object behind, and
+uploads abandoned in the create form never get attached to a listing at all.
+This job streams the bucket listing page by page, compares each key against
+the keys referenced by ``Listing.image_url`` and deletes orphans older than a
+grace period in batches of up to 1000 keys per ``delete_objects`` call.
+
+The referenced keys are held in a fixed-size Bloom filter rather than a set,
+so memory stays constant however many listings there are. A key the filter
+rejects is certainly unreferenced. A false positive only keeps an orphan
+until a later run: the filter is salted randomly per run, so the same key
+does not collide every time.
+
+Uploads are deduplicated by content hash, so an old orphan can be uploaded
+again, or attached to a new listing, while the job runs. Right before each
+batch is deleted, its keys are checked against the listings table again and
+their LastModified is re-read, and keys that are referenced or newer than the
+cutoff are skipped.
+
+Usage:
+    uv run python gc_images.py --dry-run
+    uv run python gc_images.py --grace-hours 48
+"""
+
+import argparse
+import hashlib
+import os
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from botocore.exceptions import ClientError
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Listing
+from storage import S3_BUCKET, key_from_url, s3_client
+
+# S3 DeleteObjects accepts at most 1000 keys per request
+DELETE_BATCH_SIZE = 1000
+GC_GRACE_HOURS = int(os.getenv("IMAGE_GC_GRACE_HOURS", "24"))
+# 2 MiB by default: about 0.05% false positives at 1M referenced images
+GC_BLOOM_BITS = int(os.getenv("IMAGE_GC_BLOOM_BITS", str(1 << 24)))
+GC_BLOOM_HASHES = 7
+
+
+@dataclass
+class GCStats:
+    scanned: int = 0
+    referenced: int = 0
+    too_recent: int = 0
+    orphaned: int = 0
+    orphaned_bytes: int = 0
+    reattached: int = 0
+    refreshed: int = 0
+    deleted: int = 0
+    errors: int = 0
+
+
+class KeyFilter:
+    """Bloom filter over object keys: no false negatives, rare false positives"""
+
+    def __init__(self, bits: int = GC_BLOOM_BITS, hashes: int = GC_BLOOM_HASHES) -> None:
+        self.bits = bits
+        self.hashes = hashes
+        self.array = bytearray((bits + 7) // 8)
+        self.salt = os.urandom(16)
+
+    def _positions(self, key: str) -> list[int]:
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16, salt=self.salt).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.array[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.array[pos >> 3] >> (pos & 7) & 1 for pos in self._positions(key))
+
+
+def referenced_keys(db: Session) -> KeyFilter:
+    """Collect the object keys referenced by any listing"""
+    keys = KeyFilter()
+    rows = db.query(Listing.image_url).filter(Listing.image_url.isnot(None)).yield_per(5000)
+    for (image_url,) in rows:
+        key = key_from_url(image_url)
+        if key:
+            keys.add(key)
+    return keys
+
+
+def _still_referenced(db: Session, keys: list[str]) -> set[str]:
+    """Return the keys that a listing references right now"""
+    # Same rule as key_from_url: last path segment, ignoring any query string
+    key_expr = func.regexp_replace(func.split_part(Listing.image_url, "?", 1), "^.*/", "")
+    rows = db.query(key_expr).filter(key_expr.in_(keys)).distinct()
+    return {key for (key,) in rows}
+
+
+def _modified_since(key: str, cutoff: datetime) -> bool:
+    """Whether an object was re-uploaded after cutoff, or is already gone"""
+    try:
+        head = s3_client.head_object(Bucket=S3_BUCKET, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return True
+        raise
+    return head["LastModified"] > cutoff
+
+
+def _delete_batch(db: Session, keys: list[str], cutoff: datetime, stats: GCStats) -> None:
+    # Drop keys attached to a listing since referenced_keys() was read
+    reattached = _still_referenced(db, keys)
+    # Don't hold a transaction open across the S3 calls
+    db.rollback()
+    if reattached:
+        stats.reattached += len(reattached)
+        keys = [key for key in keys if key not in reattached]
+
+    # store_image bumps LastModified when an existing image is uploaded again,
+    # which may have happened after this key was listed
+    refreshed = {key for key in keys if _modified_since(key, cutoff)}
+    if refreshed:
+        stats.refreshed += len(refreshed)
+        keys = [key for key in keys if key not in refreshed]
+    if not keys:
+        return
+
+    response = s3_client.delete_objects(
+        Bucket=S3_BUCKET,
+        Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+    )
+    errors = response.get("Errors", [])
+    for error in errors:
+        print(f"Failed to delete {error.get('Key')}: {error.get('Message')}")
+    stats.errors += len(errors)
+    stats.deleted += len(keys) - len(errors)
+
+
+def collect_garbage(db: Session, grace: timedelta, dry_run: bool = False) -> GCStats:
+    stats = GCStats()
+    keep = referenced_keys(db)
+    cutoff = datetime.now(UTC) - grace
+    pending: list[str] = []
+
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=S3_BUCKET):
+        for obj in page.get("Contents", []):
+            stats.scanned += 1
+            key = obj["Key"]
+            if key in keep:
+                stats.referenced += 1
+                continue
+            # Give in-flight uploads time to be attached to a listing
+            if obj["LastModified"] > cutoff:
+                stats.too_recent += 1
+                continue
+
+            stats.orphaned += 1
+            stats.orphaned_bytes += obj.get("Size", 0)
+            if dry_run:
+                print(f"Would delete {key}")
+                continue
+
+            pending.append(key)
+            if len(pending) == DELETE_BATCH_SIZE:
+                _delete_batch(db, pending, cutoff, stats)
+                pending = []
+
+    if pending:
+        _delete_batch(db, pending, cutoff, stats)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Delete images no listing references")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Report orphans without deleting them"
+    )
+    parser.add_argument(
+        "--grace-hours",
+        type=int,
+        default=GC_GRACE_HOURS,
+        help=f"Only delete objects older than this (default: {GC_GRACE_HOURS})",
+    )
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        stats = collect_garbage(db, timedelta(hours=args.grace_hours), dry_run=args.dry_run)
+    finally:
+        db.close()
+
+    print(
+        f"Scanned {stats.scanned} objects: {stats.referenced} referenced, "
+        f"{stats.too_recent} within grace period, {stats.orphaned} orphaned "
+        f"({stats.orphaned_bytes} bytes)"
+    )
+    if args.dry_run:
+        print("Dry run - nothing deleted")
+    else:
+        print(
+            f"Deleted {stats.deleted} objects, {stats.errors} errors, "
+            f"{stats.reattached} skipped after being attached to a listing, "
+            f"{stats.refreshed} skipped after being uploaded again or removed"
+        )
+
+
+if __name__ == "__main__":
+    main()
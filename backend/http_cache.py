@@ -0,0 +1,101 @@
+"""HTTP validators and Cache-Control policies for public listing reads."""
+
+import hashlib
+import os
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+LISTING_CACHE_MAX_AGE = int(os.getenv("LISTING_CACHE_MAX_AGE", "10"))
+LISTING_CACHE_STALE_SECONDS = int(os.getenv("LISTING_CACHE_STALE_SECONDS", "120"))
+
+# Collection reads: short freshness, then serve stale while refetching in the background
+PUBLIC_CACHE_CONTROL = (
+    f"public, max-age={LISTING_CACHE_MAX_AGE}, stale-while-revalidate={LISTING_CACHE_STALE_SECONDS}"
+)
+# Detail reads: always revalidate so an edit shows up immediately; unchanged
+# listings cost a 304 without loading the row
+DETAIL_CACHE_CONTROL = "public, no-cache"
+
+
+def set_public_cache(response: Response) -> None:
+    response.headers["Cache-Control"] = PUBLIC_CACHE_CONTROL
+
+
+EPOCH = datetime.fromtimestamp(0, UTC)
+
+
+def listing_version(updated_at: datetime | None, created_at: datetime | None) -> datetime:
+    # updated_at is only set once a listing has been edited
+    modified = updated_at or created_at or EPOCH
+    if modified.tzinfo is None:
+        modified = modified.replace(tzinfo=UTC)
+    return modified
+
+
+def _version_tag(modified_at: datetime) -> int:
+    # Full precision, so two edits within the same second get different ETags
+    return (modified_at - EPOCH) // timedelta(microseconds=1)
+
+
+def listing_etag(listing_id: int, modified_at: datetime, variant: str | None = None) -> str:
+    tag = f"{listing_id}-{_version_tag(modified_at)}"
+    if variant:
+        tag = f"{tag}-{variant}"
+    # Weak: the body is equivalent, not byte-identical, across serializations
+    return f'W/"{tag}"'
+
+
+def batch_etag(versions: list[tuple[int, datetime]], variant: str | None = None) -> str:
+    """ETag for a set of listings, changing whenever any member changes or disappears"""
+    digest = hashlib.sha1(usedforsecurity=False)
+    for listing_id, modified_at in versions:
+        digest.update(f"{listing_id}-{_version_tag(modified_at)};".encode())
+    if variant:
+        digest.update(variant.encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def has_conditional_headers(request: Request, etag_only: bool = False) -> bool:
+    if "if-none-match" in request.headers:
+        return True
+    return not etag_only and "if-modified-since" in request.headers
+
+
+def is_not_modified(request: Request, etag: str, modified_at: datetime | None) -> bool:
+    """Evaluate conditional headers. With no modified_at only the ETag is checked."""
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag.removeprefix("W/") in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and modified_at is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=UTC)
+        # HTTP dates have second precision
+        return modified_at.replace(microsecond=0) <= since
+    return False
+
+
+def set_validators(response: Response, etag: str, modified_at: datetime | None) -> None:
+    response.headers["ETag"] = etag
+    if modified_at is not None:
+        response.headers["Last-Modified"] = format_datetime(
+            modified_at.replace(microsecond=0), usegmt=True
+        )
+    response.headers["Cache-Control"] = DETAIL_CACHE_CONTROL
+
+
+def not_modified_response(etag: str, modified_at: datetime | None) -> Response:
+    response = Response(status_code=304)
+    set_validators(response, etag, modified_at)
+    return response
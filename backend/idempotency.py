@@ -0,0 +1,146 @@
+"""Idempotency-Key support for POST routes.
+
+The first request with a given key claims it by inserting a pending row. The
+handler stores its response on that row in the same transaction as its own
+writes, so either both are saved or neither is; the stored response is replayed
+for any retry with the same key and payload. A pending claim whose request died
+without releasing it can be taken over after IDEMPOTENCY_LEASE_SECONDS. Keys
+expire after IDEMPOTENCY_TTL_SECONDS.
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models import IdempotencyKey
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+# Expired keys are swept at most this often per worker
+PURGE_INTERVAL_SECONDS = 600
+
+_last_purge = 0.0
+
+
+def fingerprint(*parts: str | bytes) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8") if isinstance(part, str) else part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _purge_expired(db: Session, cutoff: datetime) -> None:
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge < PURGE_INTERVAL_SECONDS:
+        return
+    _last_purge = now
+    db.query(IdempotencyKey).filter(IdempotencyKey.created_at < cutoff).delete()
+    db.commit()
+
+
+def begin(db: Session, scope: str, key: str, request_fingerprint: str) -> JSONResponse | None:
+    """Claim an idempotency key.
+
+    Returns None if this request should be processed, or the stored response
+    if an earlier request with the same key already completed.
+    """
+    cutoff = datetime.now(UTC) - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    _purge_expired(db, cutoff)
+
+    # An expired key may be reused
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.scope == scope,
+        IdempotencyKey.key == key,
+        IdempotencyKey.created_at < cutoff,
+    ).delete()
+
+    claimed = db.execute(
+        insert(IdempotencyKey)
+        .values(scope=scope, key=key, fingerprint=request_fingerprint)
+        .on_conflict_do_nothing(index_elements=["scope", "key"])
+        .returning(IdempotencyKey.id)
+    ).first()
+    db.commit()
+    if claimed:
+        return None
+
+    existing = (
+        db.query(IdempotencyKey)
+        .filter(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        .first()
+    )
+    if existing is None:
+        # Released by a failed request in the meantime; let the client retry
+        raise HTTPException(status_code=409, detail="Idempotency key is being reused, retry")
+    if existing.fingerprint != request_fingerprint:
+        raise HTTPException(
+            status_code=422, detail="Idempotency key was already used with a different request"
+        )
+    if existing.status_code is None:
+        # Take over a claim whose request crashed before completing or releasing it
+        lease_cutoff = datetime.now(UTC) - timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)
+        reclaimed = (
+            db.query(IdempotencyKey)
+            .filter(
+                IdempotencyKey.id == existing.id,
+                IdempotencyKey.status_code.is_(None),
+                IdempotencyKey.created_at < lease_cutoff,
+            )
+            .update({IdempotencyKey.created_at: func.now()})
+        )
+        db.commit()
+        if reclaimed:
+            return None
+        raise HTTPException(
+            status_code=409, detail="A request with this idempotency key is in progress"
+        )
+    return JSONResponse(
+        status_code=existing.status_code,
+        content=json.loads(existing.response_body or "null"),
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def complete(db: Session, scope: str, key: str, status_code: int, body: Any) -> None:
+    """Store the response on the claim. The caller commits it with its own writes."""
+    stored = (
+        db.query(IdempotencyKey)
+        .filter(
+            IdempotencyKey.scope == scope,
+            IdempotencyKey.key == key,
+            IdempotencyKey.status_code.is_(None),
+        )
+        .update(
+            {
+                IdempotencyKey.status_code: status_code,
+                IdempotencyKey.response_body: json.dumps(body),
+            }
+        )
+    )
+    if not stored:
+        # The lease expired and a retry took the claim over and finished first
+        raise HTTPException(
+            status_code=409, detail="Idempotency key was completed by another request"
+        )
+
+
+def release(db: Session, scope: str, key: str) -> None:
+    """Drop a pending claim after a failed request so the client can retry with the same key"""
+    db.rollback()
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.scope == scope,
+        IdempotencyKey.key == key,
+        IdempotencyKey.status_code.is_(None),
+    ).delete()
+    db.commit()
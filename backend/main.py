@@ -1,41 +1,69 @@
 import io
 import os
-import uuid
-
-import boto3
-from botocore.client import Config
-from fastapi import Depends, FastAPI, File, HTTPException, UploadFile
+from contextlib import asynccontextmanager
+from typing import Literal
+
+from fastapi import (
+    Depends,
+    FastAPI,
+    File,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+)
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from sqlalchemy import Integer, any_, literal, or_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Query as SQLQuery
+from sqlalchemy.orm import Session, joinedload
 
+import idempotency
 from auth import get_current_user_required
 from database import Base, engine, get_db
+from http_cache import (
+    batch_etag,
+    has_conditional_headers,
+    is_not_modified,
+    listing_etag,
+    listing_version,
+    not_modified_response,
+    set_public_cache,
+    set_validators,
+)
 from models import Listing, User
+from routes.analytics import router as analytics_router
 from routes.auth import router as auth_router
-from schemas import ListingCreate, ListingResponse, ListingStatus, ListingType, ListingUpdate
+from routes.saved_searches import router as saved_searches_router
+from saved_searches import record_matches
+from schemas import (
+    ListingBatchResponse,
+    ListingCreate,
+    ListingResponse,
+    ListingStatus,
+    ListingType,
+    ListingUpdate,
+    ListingWithOwnerResponse,
+)
+from similarity import similarity_index
+from storage import IMAGE_EXTENSIONS, S3_BUCKET, public_url_for, s3_client, store_image
 
 # Create tables
 Base.metadata.create_all(bind=engine)
 
-# S3/MinIO configuration
-S3_ENDPOINT = os.getenv("S3_ENDPOINT", "http://localhost:9000")
-S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY", "minioadmin")
-S3_SECRET_KEY = os.getenv("S3_SECRET_KEY", "minioadmin123")
-S3_BUCKET = os.getenv("S3_BUCKET", "gingerbread")
-S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL", "http://localhost:9000")
-
-# Initialize S3 client
-s3_client = boto3.client(
-    "s3",
-    endpoint_url=S3_ENDPOINT,
-    aws_access_key_id=S3_ACCESS_KEY,
-    aws_secret_access_key=S3_SECRET_KEY,
-    config=Config(signature_version="s3v4"),
-)
 
-app = FastAPI(title="Gingerbread Houses API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the similar-listings index in the background; /similar falls back
+    # to SQL until it is ready
+    similarity_index.start()
+    yield
+
+
+app = FastAPI(title="Gingerbread Houses API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware - configure allowed origins from environment
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://localhost:5174").split(
@@ -49,8 +77,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Include auth router
+# Include routers
 app.include_router(auth_router)
+app.include_router(analytics_router)
+app.include_router(saved_searches_router)
+
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "100"))
+
+# Related objects that listing reads can embed via ?include=
+ListingInclude = Literal["owner"]
+
+
+def _with_includes(query: SQLQuery, include: ListingInclude | None) -> SQLQuery:
+    if include == "owner":
+        # One JOIN for all rows, fetching only the public user columns
+        query = query.options(joinedload(Listing.owner).load_only(User.id, User.username))
+    return query
+
+
+def _listing_response(listing: Listing, include: ListingInclude | None) -> ListingResponse:
+    listing.has_gumdrop_garden = int(bool(listing.has_gumdrop_garden))
+    if include == "owner":
+        return ListingWithOwnerResponse.model_validate(listing)
+    return ListingResponse.model_validate(listing)
 
 
 @app.get("/")
@@ -62,44 +111,22 @@ def read_root():
 async def upload_image(file: UploadFile = File(...)):
     """Upload an image to S3/MinIO and return its URL"""
     # Validate file type
-    allowed_types = ["image/jpeg", "image/png", "image/gif", "image/webp"]
+    allowed_types = list(IMAGE_EXTENSIONS)
     if file.content_type not in allowed_types:
         raise HTTPException(
             status_code=400, detail=f"Invalid file type. Allowed types: {', '.join(allowed_types)}"
         )
 
-    # Generate unique filename
-    ext = "jpg"
-    if file.filename and "." in file.filename:
-        ext = file.filename.split(".")[-1]
-    filename = f"{uuid.uuid4()}.{ext}"
-
     # Read file content
     content = await file.read()
 
-    # Upload to S3/MinIO
+    # Upload to S3/MinIO under a content hash, so retried uploads reuse one object
     try:
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=filename,
-            Body=content,
-            ContentType=file.content_type,
-        )
+        filename = store_image(content, file.content_type)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upload image: {str(e)}") from e
 
-    # Return URL - use proxy URL if S3_PUBLIC_URL contains /api/images (proxy mode)
-    # Otherwise use direct S3 URL
-    if "/api/images" in S3_PUBLIC_URL:
-        # S3_PUBLIC_URL is the full proxy URL (e.g., https://backend.example.com/api/images)
-        public_url = f"{S3_PUBLIC_URL}/{filename}"
-    elif S3_PUBLIC_URL.startswith("/api"):
-        # Relative proxy URL (only works in dev with Vite proxy)
-        public_url = f"/api/images/{filename}"
-    else:
-        # Direct S3/MinIO access
-        public_url = f"{S3_PUBLIC_URL}/{S3_BUCKET}/{filename}"
-    return {"url": public_url, "filename": filename}
+    return {"url": public_url_for(filename), "filename": filename}
 
 
 @app.get("/api/images/{filename}")
@@ -123,8 +150,9 @@ async def get_image(filename: str):
         raise HTTPException(status_code=500, detail=f"Failed to retrieve image: {str(e)}") from e
 
 
-@app.get("/api/listings", response_model=list[ListingResponse])
+@app.get("/api/listings", response_model=list[ListingResponse | ListingWithOwnerResponse])
 def get_listings(
+    response: Response,
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 50,
@@ -136,8 +164,9 @@ def get_listings(
     status: ListingStatus | None = None,
     min_rooms: int | None = None,
     has_gumdrop_garden: bool | None = None,
+    include: ListingInclude | None = None,
 ):
-    query = db.query(Listing)
+    query = _with_includes(db.query(Listing), include)
 
     if search:
         query = query.filter(
@@ -166,20 +195,128 @@ def get_listings(
 
     listings = query.order_by(Listing.created_at.desc()).offset(skip).limit(limit).all()
 
-    # Convert has_gumdrop_garden from int to bool
-    for listing in listings:
-        listing.has_gumdrop_garden = int(bool(listing.has_gumdrop_garden))
+    set_public_cache(response)
+    return [_listing_response(listing, include) for listing in listings]
 
-    return listings
+
+@app.get("/api/listings/mine", response_model=list[ListingResponse | ListingWithOwnerResponse])
+def get_my_listings(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_required),
+    skip: int = 0,
+    limit: int = 50,
+    include: ListingInclude | None = None,
+):
+    listings = (
+        _with_includes(db.query(Listing), include)
+        .filter(Listing.owner_id == current_user.id)
+        .order_by(Listing.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    return [_listing_response(listing, include) for listing in listings]
 
 
-@app.get("/api/listings/{listing_id}", response_model=ListingResponse)
-def get_listing(listing_id: int, db: Session = Depends(get_db)):
-    listing = db.query(Listing).filter(Listing.id == listing_id).first()
+@app.get("/api/listings/batch", response_model=ListingBatchResponse)
+def get_listings_batch(
+    request: Request,
+    response: Response,
+    ids: list[int] = Query(...),
+    db: Session = Depends(get_db),
+    include: ListingInclude | None = None,
+):
+    # Keep first occurrence order so the response lines up with the request
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {BATCH_MAX_IDS} ids can be fetched at once"
+        )
+    id_filter = Listing.id == any_(literal(ids, ARRAY(Integer)))
+
+    # Batches are validated by ETag only: a member disappearing changes the
+    # ETag but not the newest modification time, so Last-Modified would miss it
+    if has_conditional_headers(request, etag_only=True):
+        rows = db.query(Listing.id, Listing.updated_at, Listing.created_at).filter(id_filter)
+        versions = sorted((row[0], listing_version(row[1], row[2])) for row in rows)
+        etag = batch_etag(versions, include)
+        if is_not_modified(request, etag, None):
+            return not_modified_response(etag, None)
+
+    listings_by_id = {
+        listing.id: listing
+        for listing in _with_includes(db.query(Listing), include).filter(id_filter).all()
+    }
+    listings = [listings_by_id[i] for i in ids if i in listings_by_id]
+
+    versions = sorted(
+        (listing.id, listing_version(listing.updated_at, listing.created_at))
+        for listing in listings
+    )
+    set_validators(response, batch_etag(versions, include), None)
+    return {
+        "listings": [_listing_response(listing, include) for listing in listings],
+        "missing": [i for i in ids if i not in listings_by_id],
+    }
+
+
+@app.get("/api/listings/{listing_id}", response_model=ListingResponse | ListingWithOwnerResponse)
+def get_listing(
+    listing_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    include: ListingInclude | None = None,
+):
+    if has_conditional_headers(request):
+        # Check the validators from the timestamps alone before loading the full row
+        timestamps = (
+            db.query(Listing.updated_at, Listing.created_at)
+            .filter(Listing.id == listing_id)
+            .first()
+        )
+        if not timestamps:
+            raise HTTPException(status_code=404, detail="Listing not found")
+        modified_at = listing_version(*timestamps)
+        etag = listing_etag(listing_id, modified_at, include)
+        if is_not_modified(request, etag, modified_at):
+            return not_modified_response(etag, modified_at)
+
+    listing = _with_includes(db.query(Listing), include).filter(Listing.id == listing_id).first()
     if not listing:
         raise HTTPException(status_code=404, detail="Listing not found")
-    listing.has_gumdrop_garden = int(bool(listing.has_gumdrop_garden))
-    return listing
+
+    modified_at = listing_version(listing.updated_at, listing.created_at)
+    set_validators(response, listing_etag(listing.id, modified_at, include), modified_at)
+    return _listing_response(listing, include)
+
+
+@app.get("/api/listings/{listing_id}/similar", response_model=list[ListingResponse])
+def get_similar_listings(
+    listing_id: int, response: Response, db: Session = Depends(get_db), limit: int = 6
+):
+    set_public_cache(response)
+    limit = max(1, min(limit, 50))
+    similar_ids = similarity_index.similar(db, listing_id, limit)
+    if similar_ids is None:
+        raise HTTPException(status_code=404, detail="Listing not found")
+    if not similar_ids:
+        return []
+
+    listings_by_id = {
+        listing.id: listing
+        for listing in db.query(Listing).filter(Listing.id.in_(similar_ids)).all()
+    }
+    listings = []
+    for i in similar_ids:
+        if i in listings_by_id:
+            listings.append(listings_by_id[i])
+        else:
+            # Deleted by another worker; the index has no other way to learn that
+            similarity_index.remove(i)
+    for listing in listings:
+        listing.has_gumdrop_garden = int(bool(listing.has_gumdrop_garden))
+    return listings
 
 
 @app.post("/api/listings", response_model=ListingResponse)
@@ -187,7 +324,20 @@ def create_listing(
     listing: ListingCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user_required),
+    idempotency_key: str | None = Header(None, max_length=255),
 ):
+    # Retries with the same Idempotency-Key replay the original response
+    scope = f"user:{current_user.id}"
+    if idempotency_key:
+        replay = idempotency.begin(
+            db,
+            scope,
+            idempotency_key,
+            idempotency.fingerprint("POST /api/listings", listing.model_dump_json()),
+        )
+        if replay:
+            return replay
+
     db_listing = Listing(
         title=listing.title,
         description=listing.description,
@@ -204,10 +354,28 @@ def create_listing(
         image_url=listing.image_url,
         owner_id=current_user.id,
     )
-    db.add(db_listing)
-    db.commit()
+    try:
+        db.add(db_listing)
+        db.flush()
+        db.refresh(db_listing)
+        if idempotency_key:
+            # Stored in the same transaction as the listing
+            idempotency.complete(
+                db,
+                scope,
+                idempotency_key,
+                200,
+                ListingResponse.model_validate(db_listing).model_dump(mode="json"),
+            )
+        db.commit()
+    except Exception:
+        if idempotency_key:
+            idempotency.release(db, scope, idempotency_key)
+        raise
     db.refresh(db_listing)
     db_listing.has_gumdrop_garden = int(bool(db_listing.has_gumdrop_garden))
+    similarity_index.upsert(db_listing)
+    record_matches(db, db_listing)
     return db_listing
 
 
@@ -242,6 +410,8 @@ def update_listing(
 
     db.commit()
     db.refresh(db_listing)
+    similarity_index.upsert(db_listing)
+    record_matches(db, db_listing)
     db_listing.has_gumdrop_garden = int(bool(db_listing.has_gumdrop_garden))
     return db_listing
 
@@ -262,11 +432,13 @@ def delete_listing(
 
     db.delete(db_listing)
     db.commit()
+    similarity_index.remove(listing_id)
     return {"message": "Listing deleted successfully"}
 
 
 @app.get("/api/neighborhoods", response_model=list[str])
-def get_neighborhoods(db: Session = Depends(get_db)):
+def get_neighborhoods(response: Response, db: Session = Depends(get_db)):
+    set_public_cache(response)
     neighborhoods = (
         db.query(Listing.neighborhood).distinct().filter(Listing.neighborhood.isnot(None)).all()
     )
@@ -1,7 +1,7 @@
 import enum
 from datetime import datetime
 
-from sqlalchemy import DateTime, Float, ForeignKey, Integer, String, Text, func
+from sqlalchemy import DateTime, Float, ForeignKey, Integer, String, Text, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from database import Base
@@ -60,12 +60,80 @@ class Listing(Base):
     image_url: Mapped[str | None] = mapped_column(String(500))
 
     # Owner relationship
-    owner_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("users.id"), nullable=True)
-    owner: Mapped["User | None"] = relationship("User", back_populates="listings")
+    owner_id: Mapped[int | None] = mapped_column(
+        Integer, ForeignKey("users.id"), nullable=True, index=True
+    )
+    # raise: the owner must be eager-loaded (see ?include=owner) so reads can never
+    # fall back to one lazy query per listing
+    owner: Mapped["User | None"] = relationship("User", back_populates="listings", lazy="raise")
 
     created_at: Mapped[datetime | None] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
+    # Indexed so workers can poll for recently updated listings (see similarity.py)
     updated_at: Mapped[datetime | None] = mapped_column(
-        DateTime(timezone=True), onupdate=func.now()
+        DateTime(timezone=True), onupdate=func.now(), index=True
+    )
+
+
+class SavedSearch(Base):
+    __tablename__ = "saved_searches"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    name: Mapped[str | None] = mapped_column(String(255))
+
+    # Same filters as GET /api/listings
+    search: Mapped[str | None] = mapped_column(String(255))
+    min_price: Mapped[float | None] = mapped_column(Float)
+    max_price: Mapped[float | None] = mapped_column(Float)
+    neighborhood: Mapped[str | None] = mapped_column(String(200))
+    listing_type: Mapped[str | None] = mapped_column(String(50))
+    status: Mapped[str | None] = mapped_column(String(50))
+    min_rooms: Mapped[int | None] = mapped_column(Integer)
+    has_gumdrop_garden: Mapped[int | None] = mapped_column(Integer)
+
+    created_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+
+class SavedSearchMatch(Base):
+    __tablename__ = "saved_search_matches"
+    __table_args__ = (UniqueConstraint("saved_search_id", "listing_id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    saved_search_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("saved_searches.id", ondelete="CASCADE"), nullable=False
+    )
+    # Denormalized from the saved search so the inbox is a single indexed lookup
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    listing_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("listings.id", ondelete="CASCADE"), nullable=False
+    )
+    listing: Mapped["Listing"] = relationship("Listing")
+    is_read: Mapped[int] = mapped_column(Integer, default=0)
+    matched_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("scope", "key"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # "user:<id>" of the caller; every idempotent route requires authentication
+    scope: Mapped[str] = mapped_column(String(50), nullable=False)
+    key: Mapped[str] = mapped_column(String(255), nullable=False)
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
+    # NULL while the first request with this key is still being processed
+    status_code: Mapped[int | None] = mapped_column(Integer)
+    response_body: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), index=True
     )
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, Literal
+
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models import Listing
+from schemas import ListingTypePriceStats, NeighborhoodPriceStats, NewListingsPoint
+
+router = APIRouter(prefix="/api/analytics", tags=["analytics"])
+
+# Aggregates are recomputed at most once per interval per worker
+ANALYTICS_REFRESH_SECONDS = int(os.getenv("ANALYTICS_REFRESH_SECONDS", "300"))
+
+_cache: dict[str, tuple[float, Any]] = {}
+# One lock per key, so a slow aggregate only holds up requests for the same figure
+_key_locks: dict[str, threading.Lock] = {}
+_key_locks_lock = threading.Lock()
+
+
+def _cached(key: str, response: Response, compute: Callable[[], Any]) -> Any:
+    entry = _cache.get(key)
+    if entry is None or entry[0] <= time.monotonic():
+        with _key_locks_lock:
+            key_lock = _key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another request may have refreshed it while we waited
+            entry = _cache.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                value = compute()
+                entry = (time.monotonic() + ANALYTICS_REFRESH_SECONDS, value)
+                _cache[key] = entry
+    expires_at, value = entry
+    now = time.monotonic()
+    response.headers["Cache-Control"] = f"public, max-age={max(0, int(expires_at - now))}"
+    return value
+
+
+def _median(column):
+    return func.percentile_cont(0.5).within_group(column)
+
+
+@router.get("/price-per-sqft", response_model=list[NeighborhoodPriceStats])
+def price_per_sqft_by_neighborhood(response: Response, db: Session = Depends(get_db)):
+    def compute():
+        price_per_sqft = Listing.price / Listing.square_feet
+        rows = (
+            db.query(
+                Listing.neighborhood,
+                func.count(Listing.id),
+                _median(price_per_sqft),
+                func.avg(price_per_sqft),
+            )
+            .filter(Listing.neighborhood.isnot(None), Listing.square_feet > 0)
+            .group_by(Listing.neighborhood)
+            .order_by(Listing.neighborhood)
+            .all()
+        )
+        return [
+            NeighborhoodPriceStats(
+                neighborhood=neighborhood,
+                listings=count,
+                median_price_per_sqft=median,
+                avg_price_per_sqft=avg,
+            )
+            for neighborhood, count, median, avg in rows
+        ]
+
+    return _cached("price-per-sqft", response, compute)
+
+
+@router.get("/price-by-type", response_model=list[ListingTypePriceStats])
+def price_distribution_by_type(response: Response, db: Session = Depends(get_db)):
+    def compute():
+        rows = (
+            db.query(
+                Listing.listing_type,
+                func.count(Listing.id),
+                func.min(Listing.price),
+                func.percentile_cont(0.25).within_group(Listing.price),
+                _median(Listing.price),
+                func.percentile_cont(0.75).within_group(Listing.price),
+                func.max(Listing.price),
+                func.avg(Listing.price),
+            )
+            .group_by(Listing.listing_type)
+            .order_by(Listing.listing_type)
+            .all()
+        )
+        return [
+            ListingTypePriceStats(
+                listing_type=listing_type,
+                listings=count,
+                min_price=min_price,
+                p25_price=p25,
+                median_price=median,
+                p75_price=p75,
+                max_price=max_price,
+                avg_price=avg,
+            )
+            for listing_type, count, min_price, p25, median, p75, max_price, avg in rows
+        ]
+
+    return _cached("price-by-type", response, compute)
+
+
+@router.get("/new-listings", response_model=list[NewListingsPoint])
+def new_listings_by_status(
+    response: Response,
+    db: Session = Depends(get_db),
+    interval: Literal["day", "week", "month"] = "month",
+):
+    """Listings created per period, split by their current status.
+
+    Status history is not stored, so this is not a point-in-time inventory: a
+    listing created in January and sold in March counts as sold in January.
+    """
+
+    def compute():
+        period = func.date_trunc(interval, Listing.created_at)
+        rows = (
+            db.query(period, Listing.status, func.count(Listing.id))
+            .filter(Listing.created_at.isnot(None))
+            .group_by(period, Listing.status)
+            .order_by(period, Listing.status)
+            .all()
+        )
+        return [
+            NewListingsPoint(period=p, status=status, listings=count) for p, status, count in rows
+        ]
+
+    return _cached(f"new-listings:{interval}", response, compute)
@@ -0,0 +1,141 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from sqlalchemy.orm import Session, joinedload
+
+import idempotency
+from auth import get_current_user_required
+from database import get_db
+from models import SavedSearch, SavedSearchMatch, User
+from saved_searches import saved_search_index
+from schemas import SavedSearchCreate, SavedSearchMatchResponse, SavedSearchResponse
+
+router = APIRouter(prefix="/api/saved-searches", tags=["saved-searches"])
+
+
+@router.post("", response_model=SavedSearchResponse, status_code=status.HTTP_201_CREATED)
+def create_saved_search(
+    saved_search: SavedSearchCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_required),
+    idempotency_key: str | None = Header(None, max_length=255),
+):
+    # Retries with the same Idempotency-Key replay the original response
+    scope = f"user:{current_user.id}"
+    if idempotency_key:
+        replay = idempotency.begin(
+            db,
+            scope,
+            idempotency_key,
+            idempotency.fingerprint("POST /api/saved-searches", saved_search.model_dump_json()),
+        )
+        if replay:
+            return replay
+
+    db_saved_search = SavedSearch(
+        user_id=current_user.id,
+        name=saved_search.name,
+        search=saved_search.search,
+        min_price=saved_search.min_price,
+        max_price=saved_search.max_price,
+        neighborhood=saved_search.neighborhood,
+        listing_type=saved_search.listing_type.value if saved_search.listing_type else None,
+        status=saved_search.status.value if saved_search.status else None,
+        min_rooms=saved_search.min_rooms,
+        has_gumdrop_garden=(
+            None
+            if saved_search.has_gumdrop_garden is None
+            else int(saved_search.has_gumdrop_garden)
+        ),
+    )
+    try:
+        db.add(db_saved_search)
+        db.flush()
+        db.refresh(db_saved_search)
+        if idempotency_key:
+            # Stored in the same transaction as the saved search
+            idempotency.complete(
+                db,
+                scope,
+                idempotency_key,
+                status.HTTP_201_CREATED,
+                SavedSearchResponse.model_validate(db_saved_search).model_dump(mode="json"),
+            )
+        db.commit()
+    except Exception:
+        if idempotency_key:
+            idempotency.release(db, scope, idempotency_key)
+        raise
+    db.refresh(db_saved_search)
+    saved_search_index.add(db_saved_search)
+    return db_saved_search
+
+
+@router.get("", response_model=list[SavedSearchResponse])
+def get_saved_searches(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_required),
+):
+    return (
+        db.query(SavedSearch)
+        .filter(SavedSearch.user_id == current_user.id)
+        .order_by(SavedSearch.created_at.desc())
+        .all()
+    )
+
+
+@router.delete("/{saved_search_id}")
+def delete_saved_search(
+    saved_search_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_required),
+):
+    db_saved_search = (
+        db.query(SavedSearch)
+        .filter(SavedSearch.id == saved_search_id, SavedSearch.user_id == current_user.id)
+        .first()
+    )
+    if not db_saved_search:
+        raise HTTPException(status_code=404, detail="Saved search not found")
+
+    db.delete(db_saved_search)
+    db.commit()
+    saved_search_index.remove(saved_search_id)
+    return {"message": "Saved search deleted successfully"}
+
+
+@router.get("/inbox", response_model=list[SavedSearchMatchResponse])
+def get_inbox(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_required),
+    unread_only: bool = False,
+    skip: int = 0,
+    limit: int = 50,
+):
+    query = (
+        db.query(SavedSearchMatch)
+        .options(joinedload(SavedSearchMatch.listing))
+        .filter(SavedSearchMatch.user_id == current_user.id)
+    )
+    if unread_only:
+        query = query.filter(SavedSearchMatch.is_read == 0)
+
+    matches = query.order_by(SavedSearchMatch.matched_at.desc()).offset(skip).limit(limit).all()
+    for match in matches:
+        match.listing.has_gumdrop_garden = int(bool(match.listing.has_gumdrop_garden))
+    return matches
+
+
+@router.post("/inbox/{match_id}/read")
+def mark_match_read(
+    match_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_required),
+):
+    updated = (
+        db.query(SavedSearchMatch)
+        .filter(SavedSearchMatch.id == match_id, SavedSearchMatch.user_id == current_user.id)
+        .update({SavedSearchMatch.is_read: 1})
+    )
+    if not updated:
+        raise HTTPException(status_code=404, detail="Match not found")
+    db.commit()
+    return {"message": "Match marked as read"}
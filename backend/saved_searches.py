@@ -0,0 +1,237 @@
+"""Incremental matching of written listings against saved searches.
+
+Rather than re-running every saved search after each write, saved searches are
+bucketed by their exact-match filters (listing_type, status) and, within a
+bucket, kept sorted by min_price. A listing only has to look at the four
+buckets it can fall into and, in each, the prefix of searches whose min_price
+it satisfies; the remaining filters are checked per candidate.
+
+The index is per process. Before matching, each worker fetches saved searches
+with ids above the highest one it has fetched from the database, so searches
+saved through other workers are matched right away. Ids are assigned before
+commit, so a search can become visible after a higher id already has; the last
+SYNC_ID_WINDOW ids below the high-water mark are fetched again each time to
+catch those. Searches deleted elsewhere are filtered out when the matches are
+inserted and pruned from memory by a periodic background rebuild.
+"""
+
+import bisect
+import math
+import os
+import threading
+import time
+from typing import NamedTuple
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Listing, SavedSearch, SavedSearchMatch
+
+SAVED_SEARCH_REBUILD_SECONDS = int(os.getenv("SAVED_SEARCH_REBUILD_SECONDS", "300"))
+# How far below the high-water mark each sync looks for late-committing searches
+SYNC_ID_WINDOW = 100
+
+
+class SearchPredicate(NamedTuple):
+    saved_search_id: int
+    user_id: int
+    search: str | None
+    max_price: float | None
+    neighborhood: str | None
+    min_rooms: int | None
+    has_gumdrop_garden: int | None
+
+    @classmethod
+    def from_saved_search(cls, saved_search: SavedSearch) -> "SearchPredicate":
+        return cls(
+            saved_search_id=saved_search.id,
+            user_id=saved_search.user_id,
+            search=saved_search.search.lower() if saved_search.search else None,
+            max_price=saved_search.max_price,
+            neighborhood=saved_search.neighborhood.lower() if saved_search.neighborhood else None,
+            min_rooms=saved_search.min_rooms,
+            has_gumdrop_garden=saved_search.has_gumdrop_garden,
+        )
+
+    def matches(self, listing: Listing) -> bool:
+        """Check the filters not covered by the bucket key, as get_listings applies them"""
+        if self.max_price is not None and listing.price > self.max_price:
+            return False
+        if self.neighborhood and self.neighborhood not in (listing.neighborhood or "").lower():
+            return False
+        if self.min_rooms is not None and (
+            listing.num_rooms is None or listing.num_rooms < self.min_rooms
+        ):
+            return False
+        if self.has_gumdrop_garden is not None and bool(listing.has_gumdrop_garden) != bool(
+            self.has_gumdrop_garden
+        ):
+            return False
+        if self.search:
+            fields = (listing.title, listing.description, listing.address, listing.neighborhood)
+            if not any(self.search in (field or "").lower() for field in fields):
+                return False
+        return True
+
+
+class _Bucket:
+    def __init__(self) -> None:
+        self.min_prices: list[float] = []
+        self.predicates: list[SearchPredicate] = []
+
+    def add(self, min_price: float, predicate: SearchPredicate) -> None:
+        pos = bisect.bisect_right(self.min_prices, min_price)
+        self.min_prices.insert(pos, min_price)
+        self.predicates.insert(pos, predicate)
+
+    def remove(self, saved_search_id: int) -> None:
+        for pos, predicate in enumerate(self.predicates):
+            if predicate.saved_search_id == saved_search_id:
+                del self.min_prices[pos]
+                del self.predicates[pos]
+                return
+
+    def candidates(self, price: float) -> list[SearchPredicate]:
+        return self.predicates[: bisect.bisect_right(self.min_prices, price)]
+
+
+BucketKey = tuple[str | None, str | None]
+
+
+class _Predicates:
+    def __init__(self) -> None:
+        self.buckets: dict[BucketKey, _Bucket] = {}
+        self.keys: dict[int, BucketKey] = {}
+        # Highest saved search id fetched from the database. Only moved by
+        # _build and _sync, so searches added locally through add() never
+        # hide lower ids created by other workers.
+        self.max_id = 0
+
+    def add(self, saved_search: SavedSearch) -> None:
+        if saved_search.id in self.keys:
+            return
+        key = (saved_search.listing_type, saved_search.status)
+        min_price = saved_search.min_price if saved_search.min_price is not None else -math.inf
+        self.buckets.setdefault(key, _Bucket()).add(
+            min_price, SearchPredicate.from_saved_search(saved_search)
+        )
+        self.keys[saved_search.id] = key
+
+    def remove(self, saved_search_id: int) -> None:
+        key = self.keys.pop(saved_search_id, None)
+        if key is not None:
+            self.buckets[key].remove(saved_search_id)
+
+
+class SavedSearchIndex:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._predicates: _Predicates | None = None
+        self._built_at = 0.0
+
+    def _build(self, db: Session) -> None:
+        predicates = _Predicates()
+        for saved_search in db.query(SavedSearch).yield_per(5000):
+            predicates.add(saved_search)
+            predicates.max_id = max(predicates.max_id, saved_search.id)
+        with self._lock:
+            # Searches committed while the build was running are above (or
+            # within the window below) its own max_id, so _sync fetches them
+            self._predicates = predicates
+            self._built_at = time.monotonic()
+
+    def _background_rebuild(self) -> None:
+        try:
+            db = SessionLocal()
+            try:
+                self._build(db)
+            finally:
+                db.close()
+        finally:
+            self._build_lock.release()
+
+    def _sync(self, db: Session) -> _Predicates:
+        if self._predicates is None:
+            with self._build_lock:
+                if self._predicates is None:
+                    self._build(db)
+        elif (
+            time.monotonic() - self._built_at > SAVED_SEARCH_REBUILD_SECONDS
+            # The full rebuild only prunes searches deleted on other workers
+            and self._build_lock.acquire(blocking=False)
+        ):
+            threading.Thread(target=self._background_rebuild, daemon=True).start()
+
+        predicates = self._predicates
+        assert predicates is not None
+        # Searches saved through other workers since we last looked
+        created = (
+            db.query(SavedSearch)
+            .filter(SavedSearch.id > predicates.max_id - SYNC_ID_WINDOW)
+            .order_by(SavedSearch.id)
+            .all()
+        )
+        with self._lock:
+            for saved_search in created:
+                predicates.add(saved_search)
+            if created:
+                predicates.max_id = max(predicates.max_id, created[-1].id)
+        return predicates
+
+    def add(self, saved_search: SavedSearch) -> None:
+        with self._lock:
+            if self._predicates is not None:
+                self._predicates.add(saved_search)
+
+    def remove(self, saved_search_id: int) -> None:
+        with self._lock:
+            if self._predicates is not None:
+                self._predicates.remove(saved_search_id)
+
+    def match(self, db: Session, listing: Listing) -> list[SearchPredicate]:
+        predicates = self._sync(db)
+        with self._lock:
+            matched = []
+            for key in {
+                (listing.listing_type, listing.status),
+                (listing.listing_type, None),
+                (None, listing.status),
+                (None, None),
+            }:
+                bucket = predicates.buckets.get(key)
+                if bucket is None:
+                    continue
+                for predicate in bucket.candidates(listing.price):
+                    # Owners don't need alerts about their own listings
+                    if predicate.user_id != listing.owner_id and predicate.matches(listing):
+                        matched.append(predicate)
+            return matched
+
+
+saved_search_index = SavedSearchIndex()
+
+
+def record_matches(db: Session, listing: Listing) -> None:
+    """Add a listing that was just created or updated to the inboxes of matching searches"""
+    matched = saved_search_index.match(db, listing)
+    if not matched:
+        return
+
+    # Selecting from saved_searches skips searches deleted on another worker
+    # that this worker's index has not pruned yet
+    stmt = insert(SavedSearchMatch).from_select(
+        ["saved_search_id", "user_id", "listing_id", "is_read"],
+        select(SavedSearch.id, SavedSearch.user_id, literal(listing.id), literal(0)).where(
+            SavedSearch.id.in_([predicate.saved_search_id for predicate in matched])
+        ),
+    )
+    # A listing that matches again after an update resurfaces as unread
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["saved_search_id", "listing_id"],
+        set_={"is_read": 0, "matched_at": func.now()},
+    )
+    db.execute(stmt)
+    db.commit()
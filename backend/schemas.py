@@ -54,6 +54,14 @@ class ListingUpdate(BaseModel):
     image_url: str | None = Field(None, max_length=500)
 
 
+class OwnerSummary(BaseModel):
+    id: int
+    username: str
+
+    class Config:
+        from_attributes = True
+
+
 class ListingResponse(ListingBase):
     id: int
     created_at: datetime
@@ -64,6 +72,76 @@ class ListingResponse(ListingBase):
         from_attributes = True
 
 
+class ListingWithOwnerResponse(ListingResponse):
+    owner: OwnerSummary | None = None
+
+
+class ListingBatchResponse(BaseModel):
+    listings: list[ListingResponse | ListingWithOwnerResponse]
+    missing: list[int]
+
+
+# Saved search schemas
+class SavedSearchBase(BaseModel):
+    name: str | None = Field(None, max_length=255)
+    search: str | None = Field(None, max_length=255)
+    min_price: float | None = None
+    max_price: float | None = None
+    neighborhood: str | None = Field(None, max_length=200)
+    listing_type: ListingType | None = None
+    status: ListingStatus | None = None
+    min_rooms: int | None = None
+    has_gumdrop_garden: bool | None = None
+
+
+class SavedSearchCreate(SavedSearchBase):
+    pass
+
+
+class SavedSearchResponse(SavedSearchBase):
+    id: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class SavedSearchMatchResponse(BaseModel):
+    id: int
+    saved_search_id: int
+    listing: ListingResponse
+    is_read: bool
+    matched_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# Analytics schemas
+class NeighborhoodPriceStats(BaseModel):
+    neighborhood: str
+    listings: int
+    median_price_per_sqft: float
+    avg_price_per_sqft: float
+
+
+class ListingTypePriceStats(BaseModel):
+    listing_type: str
+    listings: int
+    min_price: float
+    p25_price: float
+    median_price: float
+    p75_price: float
+    max_price: float
+    avg_price: float
+
+
+class NewListingsPoint(BaseModel):
+    period: datetime
+    status: str
+    listings: int
+
+
 # User schemas
 class UserBase(BaseModel):
     email: str
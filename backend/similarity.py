@@ -0,0 +1,410 @@
+"""In-memory nearest-neighbor index for the "similar homes" endpoint.
+
+Each listing is encoded as a fixed-length, L2-normalized float32 vector so that
+cosine similarity is a matrix-vector product. Features use fixed scales rather
+than dataset statistics, which lets writes update one row in place instead of
+re-encoding the whole set. Rows are encoded in NumPy batches.
+
+Vectors are partitioned into cells by (listing_type, neighborhood). A query
+scores its own cell first and only widens to the other cells of the same type,
+then to every cell, when it needs more results. Ranking within a tier is by
+cosine similarity, so "same neighborhood" is an exact-match signal rather than
+a hashed feature that unrelated neighborhoods could share.
+
+The index is per process. start() builds it once in a background thread at
+startup; until it is ready, similar() answers from a plain SQL query instead
+of waiting. After the build the same thread polls for listings created or
+updated by other workers, using the id and updated_at columns as watermarks.
+Ids and timestamps are assigned before commit, so each poll looks back a
+little way past both to catch rows that committed late. Listings deleted on
+other workers are dropped when a query returns them (see remove()).
+"""
+
+import logging
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections.abc import Callable, Sequence
+from datetime import datetime, timedelta
+from typing import Any
+
+import numpy as np
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session, load_only
+
+from database import SessionLocal
+from models import Listing, ListingType
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_POLL_SECONDS = float(os.getenv("SIMILARITY_POLL_SECONDS", "5"))
+# How far behind the watermarks each poll looks for rows that committed late
+POLL_ID_WINDOW = 100
+POLL_TIME_SLACK = timedelta(seconds=60)
+BUILD_BATCH_SIZE = 5000
+BUILD_RETRY_SECONDS = 30
+
+LISTING_TYPES = [t.value for t in ListingType]
+TYPE_INDEX = {listing_type: i for i, listing_type in enumerate(LISTING_TYPES)}
+NUMERIC_DIMS = 4
+TEXT_DIMS = 32
+TYPE_OFFSET = NUMERIC_DIMS
+GARDEN_OFFSET = TYPE_OFFSET + len(LISTING_TYPES)
+TEXT_OFFSET = GARDEN_OFFSET + 1
+DIMS = TEXT_OFFSET + TEXT_DIMS
+
+# Relative importance of each feature block after normalization
+NUMERIC_WEIGHT = 1.0
+TYPE_WEIGHT = 0.8
+GARDEN_WEIGHT = 0.3
+TEXT_WEIGHT = 0.5
+
+# log1p of these values maps to 1.0, so typical listings fall in [0, 1]
+NUMERIC_SCALES = np.array(
+    [
+        math.log1p(1_000_000),  # price
+        math.log1p(10_000),  # square_feet
+        math.log1p(50),  # num_rooms
+        math.log1p(1_000),  # num_candy_canes
+    ]
+)
+
+TERM_RE = re.compile(r"[a-z]{3,}")
+MAX_CACHED_TERMS = 100_000
+
+# Column order of the rows passed to encode_rows
+FEATURE_COLUMNS = (
+    Listing.id,
+    Listing.listing_type,
+    Listing.neighborhood,
+    Listing.price,
+    Listing.square_feet,
+    Listing.num_rooms,
+    Listing.num_candy_canes,
+    Listing.has_gumdrop_garden,
+    Listing.title,
+    Listing.description,
+    Listing.frosting_type,
+)
+
+CellKey = tuple[str, str]
+
+
+class _TermCodes(dict[str, int]):
+    """Memoized signed hash bucket of each term, encoded as +/-(dim + 1)"""
+
+    def __missing__(self, term: str) -> int:
+        # crc32 is stable across processes, unlike the built-in hash()
+        h = zlib.crc32(term.encode("utf-8"))
+        code = h % TEXT_DIMS + 1
+        if not (h >> 16) & 1:
+            code = -code
+        if len(self) < MAX_CACHED_TERMS:
+            self[term] = code
+        return code
+
+
+_term_codes = _TermCodes()
+
+
+def _cell_key(listing_type: str | None, neighborhood: str | None) -> CellKey:
+    return (listing_type or "", (neighborhood or "").strip().lower())
+
+
+def cell_key(listing: Listing) -> CellKey:
+    return _cell_key(listing.listing_type, listing.neighborhood)
+
+
+def _normalize_rows(vectors: np.ndarray) -> None:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+
+def encode_rows(rows: Sequence[Sequence[Any]]) -> tuple[np.ndarray, list[CellKey], np.ndarray]:
+    """Encode rows of FEATURE_COLUMNS, returning their ids, cell keys and vectors"""
+    n = len(rows)
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=n)
+    keys = [_cell_key(row[1], row[2]) for row in rows]
+    vectors = np.zeros((n, DIMS), dtype=np.float32)
+    if n == 0:
+        return ids, keys, vectors
+
+    # None becomes NaN, which is treated like a missing or negative value
+    numeric = np.array([row[3:7] for row in rows], dtype=np.float64)
+    numeric = np.where(numeric > 0, numeric, 0.0)
+    vectors[:, :NUMERIC_DIMS] = np.log1p(numeric) / NUMERIC_SCALES * NUMERIC_WEIGHT
+
+    type_idx = np.fromiter((TYPE_INDEX.get(row[1], -1) for row in rows), dtype=np.int64, count=n)
+    typed = type_idx >= 0
+    vectors[typed, TYPE_OFFSET + type_idx[typed]] = TYPE_WEIGHT
+
+    garden = np.fromiter((bool(row[7]) for row in rows), dtype=bool, count=n)
+    vectors[garden, GARDEN_OFFSET] = GARDEN_WEIGHT
+
+    # Signed feature hashing of title, description and frosting terms
+    codes: list[int] = []
+    counts = np.zeros(n, dtype=np.int64)
+    for i, row in enumerate(rows):
+        terms = TERM_RE.findall(" ".join(filter(None, row[8:11])).lower())
+        codes.extend(map(_term_codes.__getitem__, terms))
+        counts[i] = len(terms)
+    if codes:
+        code_arr = np.array(codes, dtype=np.int64)
+        text_vecs = np.zeros((n, TEXT_DIMS), dtype=np.float32)
+        np.add.at(
+            text_vecs,
+            (np.repeat(np.arange(n), counts), np.abs(code_arr) - 1),
+            np.sign(code_arr).astype(np.float32),
+        )
+        _normalize_rows(text_vecs)
+        vectors[:, TEXT_OFFSET:] = text_vecs * TEXT_WEIGHT
+
+    _normalize_rows(vectors)
+    return ids, keys, vectors
+
+
+def encode_listing(listing: Listing) -> np.ndarray:
+    row = tuple(getattr(listing, column.key) for column in FEATURE_COLUMNS)
+    return encode_rows([row])[2][0]
+
+
+class _Cell:
+    """Dense, growable storage for the vectors of one partition"""
+
+    def __init__(self) -> None:
+        self.vectors = np.zeros((0, DIMS), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.size = 0
+
+    def _reserve(self, count: int) -> None:
+        # Grow capacity geometrically so appends are amortized O(DIMS)
+        if self.size + count <= len(self.vectors):
+            return
+        capacity = max(16, len(self.vectors) * 2, self.size + count)
+        vectors = np.zeros((capacity, DIMS), dtype=np.float32)
+        vectors[: self.size] = self.vectors[: self.size]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[: self.size] = self.ids[: self.size]
+        self.vectors, self.ids = vectors, ids
+
+    def extend(self, ids: np.ndarray, vectors: np.ndarray) -> int:
+        """Append rows, returning the position of the first one"""
+        self._reserve(len(ids))
+        start = self.size
+        self.vectors[start : start + len(ids)] = vectors
+        self.ids[start : start + len(ids)] = ids
+        self.size += len(ids)
+        return start
+
+    def remove(self, row: int) -> int | None:
+        """Delete a row, returning the id of the listing moved into its place, if any"""
+        # Move the last row into the hole to keep storage dense
+        last = self.size - 1
+        self.size = last
+        if row == last:
+            return None
+        moved_id = int(self.ids[last])
+        self.vectors[row] = self.vectors[last]
+        self.ids[row] = moved_id
+        return moved_id
+
+    def top(self, query: np.ndarray, k: int, exclude_id: int) -> list[tuple[float, int]]:
+        if self.size == 0 or k <= 0:
+            return []
+        scores = self.vectors[: self.size] @ query
+        scores[self.ids[: self.size] == exclude_id] = -np.inf
+        k = min(k, self.size)
+        top = np.argpartition(scores, -k)[-k:]
+        return [(float(scores[i]), int(self.ids[i])) for i in top if scores[i] != -np.inf]
+
+
+class _Snapshot:
+    def __init__(self) -> None:
+        self.cells: dict[CellKey, _Cell] = {}
+        self.where: dict[int, tuple[CellKey, int]] = {}
+
+    def upsert_many(self, ids: np.ndarray, keys: list[CellKey], vectors: np.ndarray) -> None:
+        # Re-encode in place where the cell is unchanged; collect the rest
+        # per cell so they are appended in one copy
+        new_rows: dict[CellKey, list[int]] = {}
+        for i, (listing_id, key) in enumerate(zip(ids.tolist(), keys, strict=True)):
+            location = self.where.get(listing_id)
+            if location is not None:
+                if location[0] == key:
+                    self.cells[key].vectors[location[1]] = vectors[i]
+                    continue
+                self.remove(listing_id)
+            new_rows.setdefault(key, []).append(i)
+
+        for key, positions in new_rows.items():
+            cell_ids = ids[positions]
+            start = self.cells.setdefault(key, _Cell()).extend(cell_ids, vectors[positions])
+            for offset, listing_id in enumerate(cell_ids.tolist()):
+                self.where[listing_id] = (key, start + offset)
+
+    def remove(self, listing_id: int) -> None:
+        location = self.where.pop(listing_id, None)
+        if location is None:
+            return
+        key, row = location
+        moved_id = self.cells[key].remove(row)
+        if moved_id is not None:
+            self.where[moved_id] = (key, row)
+
+
+class SimilarityIndex:
+    def __init__(self) -> None:
+        # Guards reads and updates of the snapshot. The build fills its own
+        # snapshot outside it and swaps it in.
+        self._lock = threading.Lock()
+        self._snapshot: _Snapshot | None = None
+        self._thread: threading.Thread | None = None
+        # Watermarks for picking up writes from other workers
+        self._max_id = 0
+        self._synced_at: datetime | None = None
+
+    def start(self) -> None:
+        """Build the index and keep it current in a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while self._snapshot is None:
+            try:
+                self._with_session(self._build)
+            except Exception:
+                logger.exception("Building the similarity index failed")
+                time.sleep(BUILD_RETRY_SECONDS)
+        while True:
+            time.sleep(SIMILARITY_POLL_SECONDS)
+            try:
+                self._with_session(self._poll)
+            except Exception:
+                logger.exception("Polling for listing changes failed")
+
+    @staticmethod
+    def _with_session(fn: Callable[[Session], None]) -> None:
+        db = SessionLocal()
+        try:
+            fn(db)
+        finally:
+            db.close()
+
+    def _build(self, db: Session) -> None:
+        # Anything updated from here on is picked up by the first poll
+        synced_at = db.scalar(select(func.now()))
+        snapshot = _Snapshot()
+        max_id = 0
+        result = db.execute(select(*FEATURE_COLUMNS).execution_options(yield_per=BUILD_BATCH_SIZE))
+        for rows in result.partitions():
+            ids, keys, vectors = encode_rows(rows)
+            snapshot.upsert_many(ids, keys, vectors)
+            max_id = max(max_id, int(ids.max()))
+
+        with self._lock:
+            self._snapshot = snapshot
+            self._max_id = max_id
+            self._synced_at = synced_at
+
+    def _poll(self, db: Session) -> None:
+        assert self._synced_at is not None
+        synced_at = db.scalar(select(func.now()))
+        rows = db.execute(
+            select(*FEATURE_COLUMNS).where(
+                or_(
+                    Listing.id > self._max_id - POLL_ID_WINDOW,
+                    Listing.updated_at >= self._synced_at - POLL_TIME_SLACK,
+                )
+            )
+        ).all()
+        ids, keys, vectors = encode_rows(rows)
+        with self._lock:
+            assert self._snapshot is not None
+            self._snapshot.upsert_many(ids, keys, vectors)
+            if len(ids):
+                self._max_id = max(self._max_id, int(ids.max()))
+            self._synced_at = synced_at
+
+    def upsert(self, listing: Listing) -> None:
+        """Add or re-encode a listing after a write. No-op until the index is built."""
+        vec = encode_listing(listing)
+        key = cell_key(listing)
+        with self._lock:
+            if self._snapshot is not None:
+                self._snapshot.upsert_many(np.array([listing.id]), [key], vec[np.newaxis])
+
+    def remove(self, listing_id: int) -> None:
+        with self._lock:
+            if self._snapshot is not None:
+                self._snapshot.remove(listing_id)
+
+    def _query(self, listing_id: int, limit: int) -> list[int] | None:
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or listing_id not in snapshot.where:
+                return None
+            key, row = snapshot.where[listing_id]
+            query = snapshot.cells[key].vectors[row].copy()
+
+            results: list[int] = []
+            tiers = [
+                [key],
+                [k for k in snapshot.cells if k[0] == key[0] and k != key],
+                [k for k in snapshot.cells if k[0] != key[0]],
+            ]
+            for tier in tiers:
+                needed = limit - len(results)
+                if needed <= 0:
+                    break
+                candidates: list[tuple[float, int]] = []
+                for k in tier:
+                    candidates.extend(snapshot.cells[k].top(query, needed, listing_id))
+                candidates.sort(reverse=True)
+                results.extend(i for _, i in candidates[:needed])
+            return results
+
+    @staticmethod
+    def _query_db(db: Session, listing: Listing, limit: int) -> list[int]:
+        """Rough stand-in used until the index is built: same type, same
+        neighborhood first, then closest in price"""
+        neighborhood = cell_key(listing)[1]
+        rows = (
+            db.query(Listing.id)
+            .filter(Listing.id != listing.id, Listing.listing_type == listing.listing_type)
+            .order_by(
+                (func.lower(func.trim(Listing.neighborhood)) == neighborhood).desc(),
+                func.abs(Listing.price - listing.price),
+            )
+            .limit(limit)
+        )
+        return [listing_id for (listing_id,) in rows]
+
+    def similar(self, db: Session, listing_id: int, limit: int) -> list[int] | None:
+        """Return ids of the listings closest to listing_id, best match first.
+
+        Returns None if the listing does not exist.
+        """
+        result = self._query(listing_id, limit)
+        if result is not None:
+            return result
+
+        # Not built yet, or written by another worker since the last poll
+        listing = (
+            db.query(Listing)
+            .options(load_only(*FEATURE_COLUMNS))
+            .filter(Listing.id == listing_id)
+            .first()
+        )
+        if listing is None:
+            return None
+        if self._snapshot is None:
+            return self._query_db(db, listing, limit)
+        self.upsert(listing)
+        return self._query(listing_id, limit)
+
+
+similarity_index = SimilarityIndex()
@@ -0,0 +1,87 @@
+import hashlib
+import os
+
+import boto3
+from botocore.client import Config
+from botocore.exceptions import ClientError
+
+# S3/MinIO configuration
+S3_ENDPOINT = os.getenv("S3_ENDPOINT", "http://localhost:9000")
+S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY", "minioadmin")
+S3_SECRET_KEY = os.getenv("S3_SECRET_KEY", "minioadmin123")
+S3_BUCKET = os.getenv("S3_BUCKET", "gingerbread")
+S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL", "http://localhost:9000")
+
+# Initialize S3 client
+s3_client = boto3.client(
+    "s3",
+    endpoint_url=S3_ENDPOINT,
+    aws_access_key_id=S3_ACCESS_KEY,
+    aws_secret_access_key=S3_SECRET_KEY,
+    config=Config(signature_version="s3v4"),
+)
+
+IMAGE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+
+
+def store_image(content: bytes, content_type: str) -> str:
+    """Store image bytes under a content-addressed key and return the key.
+
+    Identical uploads (e.g. client retries) map to the same object, so they are
+    written once. Re-uploading an existing image rewrites its metadata in place
+    to bump LastModified, so the garbage collector treats it as a fresh upload;
+    a collection run that listed the object earlier re-reads LastModified before
+    deleting it.
+    """
+    filename = f"{hashlib.sha256(content).hexdigest()}.{IMAGE_EXTENSIONS[content_type]}"
+    try:
+        s3_client.head_object(Bucket=S3_BUCKET, Key=filename)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey", "NotFound"):
+            raise
+        s3_client.put_object(
+            Bucket=S3_BUCKET,
+            Key=filename,
+            Body=content,
+            ContentType=content_type,
+        )
+    else:
+        s3_client.copy_object(
+            Bucket=S3_BUCKET,
+            Key=filename,
+            CopySource={"Bucket": S3_BUCKET, "Key": filename},
+            ContentType=content_type,
+            MetadataDirective="REPLACE",
+        )
+    return filename
+
+
+def public_url_for(filename: str) -> str:
+    """Build the URL stored on a listing for an uploaded object key"""
+    # Use proxy URL if S3_PUBLIC_URL contains /api/images (proxy mode)
+    # Otherwise use direct S3 URL
+    if "/api/images" in S3_PUBLIC_URL:
+        # S3_PUBLIC_URL is the full proxy URL (e.g., https://backend.example.com/api/images)
+        return f"{S3_PUBLIC_URL}/{filename}"
+    if S3_PUBLIC_URL.startswith("/api"):
+        # Relative proxy URL (only works in dev with Vite proxy)
+        return f"/api/images/{filename}"
+    # Direct S3/MinIO access
+    return f"{S3_PUBLIC_URL}/{S3_BUCKET}/{filename}"
+
+
+def key_from_url(url: str | None) -> str | None:
+    """Extract the object key from an image URL produced by public_url_for.
+
+    Keys are flat (no slashes), so the last path segment is the key regardless
+    of which public URL mode was active when the listing was saved.
+    """
+    if not url:
+        return None
+    key = url.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+    return key or None
@@ -1,10 +1,19 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { useNavigate, useParams, Link } from 'react-router-dom'
 import ImageUpload from '../components/ImageUpload'
 import { useAuth } from '../context/AuthContext'
 
 const API_URL = import.meta.env.VITE_API_URL || ''
 
+// crypto.randomUUID only exists in secure contexts (HTTPS or localhost)
+function newIdempotencyKey() {
+  if (crypto.randomUUID) {
+    return crypto.randomUUID()
+  }
+  const bytes = crypto.getRandomValues(new Uint8Array(16))
+  return Array.from(bytes, (b) => b.toString(16).padStart(2, '0')).join('')
+}
+
 function CreateListing() {
   const navigate = useNavigate()
   const { id } = useParams()
@@ -29,6 +38,9 @@ function CreateListing() {
 
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState('')
+  // Created on first submit and reused when resubmitting the same form, so the
+  // backend can drop duplicate creates; cleared whenever the form changes
+  const idempotencyKey = useRef(null)
 
   useEffect(() => {
     if (isEditing) {
@@ -64,6 +76,7 @@ function CreateListing() {
 
   const handleChange = (e) => {
     const { name, value, type, checked } = e.target
+    idempotencyKey.current = null
     setFormData((prev) => ({
       ...prev,
       [name]: type === 'checkbox' ? checked : value,
@@ -71,6 +84,7 @@ function CreateListing() {
   }
 
   const handleImageUpload = (url) => {
+    idempotencyKey.current = null
     setFormData((prev) => ({
       ...prev,
       image_url: url,
@@ -81,6 +95,9 @@ function CreateListing() {
     e.preventDefault()
     setLoading(true)
     setError('')
+    if (!isEditing && !idempotencyKey.current) {
+      idempotencyKey.current = newIdempotencyKey()
+    }
 
     try {
       const payload = {
@@ -97,6 +114,7 @@ function CreateListing() {
         method: isEditing ? 'PUT' : 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...(isEditing ? {} : { 'Idempotency-Key': idempotencyKey.current }),
           ...getAuthHeaders(),
         },
         body: JSON.stringify(payload),